@@ -1,31 +1,54 @@
 # src/cli/chat_io.py
 
+import contextvars
 import threading
-import time
 from typing import List, Optional
 
 # Active GUI ChatIO instance (if any).
 _CURRENT_CHAT_IO: Optional["ChatIO"] = None
 _QT_APP = None
+# PyQt5.QtCore, bound once by _ensure_qt_app() (GUI mode only)
+_QT_CORE = None
 
 
 def _ensure_qt_app():
     """Create or reuse a single QApplication instance for the Qt chat UI."""
-    global _QT_APP
+    global _QT_APP, _QT_CORE
     if _QT_APP is not None:
         return _QT_APP
 
     try:
+        from PyQt5 import QtCore  # type: ignore
         from PyQt5.QtWidgets import QApplication  # type: ignore
     except Exception as e:
         raise RuntimeError("PyQt5 is required for GUI mode") from e
 
     app = QApplication.instance() or QApplication([])
+    _QT_CORE = QtCore
     _QT_APP = app
     return app
 
 
 class ChatIO:
+    __slots__ = (
+        "user_name",
+        "model_name",
+        "use_gui",
+        "_user_prefix",
+        "_model_prefix",
+        "_qt_app",
+        "_window",
+        "_text",
+        "_entry",
+        "_send_button",
+        "_pending_input",
+        "_input_loop",
+        "_pending_append",
+        "_flush_scheduled",
+        # PyQt5 needs weak references to connect bound-method slots
+        "__weakref__",
+    )
+
     def __init__(
         self,
         user_name: str = "User",
@@ -36,6 +59,9 @@ class ChatIO:
         self.user_name = user_name
         self.model_name = model_name
         self.use_gui = use_gui
+        # Message headers are fixed per instance; build them once
+        self._user_prefix = f"\n{user_name}:\n"
+        self._model_prefix = f"\n{model_name}:\n"
 
         # GUI widgets/objects
         self._qt_app = None
@@ -44,9 +70,11 @@ class ChatIO:
         self._entry = None
         self._send_button = None
         self._pending_input: Optional[str] = None
+        self._input_loop = None
 
-        # Keep console log for potential debugging
-        self._buffer: List[str] = []
+        # GUI appends waiting for the next coalesced flush
+        self._pending_append: List[str] = []
+        self._flush_scheduled = False
 
         if self.use_gui:
             self._qt_app = _ensure_qt_app()
@@ -68,24 +96,22 @@ class ChatIO:
             self.print_user_msg(msg)
             return msg
 
-        # GUI mode: wait until the user hits Enter or clicks Send
+        # GUI mode: block in a nested Qt event loop until _on_send quits it
         self._pending_input = None
-
-        app = self._qt_app
-        assert app is not None
-        app.processEvents()
-
-        while self._pending_input is None:
-            app.processEvents()
-            time.sleep(0.01)
+        self._input_loop = _QT_CORE.QEventLoop()
+        try:
+            while self._pending_input is None:
+                self._input_loop.exec_()
+        finally:
+            self._input_loop = None
 
         return self._pending_input
 
     def print_user_msg(self, msg: str) -> None:
-        self._append(f"\n{self.user_name}:\n{msg}")
+        self._append(self._user_prefix + msg)
 
     def print_assistant_msg(self, msg: str) -> None:
-        self._append(f"\n{self.model_name}:\n{msg}")
+        self._append(self._model_prefix + msg)
 
     def print_command_msg(self, command_name: str, msg: str) -> None:
         self._append(f"\n[{command_name}]:\n{msg}")
@@ -93,15 +119,30 @@ class ChatIO:
     def print_mode_selected(self, mode_name: str) -> None:
         self._append(f"\n[Selected Mode: {mode_name}]")
 
+    def run_blocking(self, fn, *args, **kwargs):
+        """Run a long blocking call; in GUI mode it runs off the UI thread so the window stays responsive."""
+        return _run_blocking_with_gui_events(fn, *args, **kwargs)
+
     # ----- internals -----
 
     def _append(self, text: str) -> None:
-        self._buffer.append(text)
         if self.use_gui and self._text is not None:
-            self._text.append(text)
+            # Coalesce bursts of messages into one widget update (~1 frame)
+            self._pending_append.append(text)
+            if not self._flush_scheduled:
+                self._flush_scheduled = True
+                _QT_CORE.QTimer.singleShot(16, self._flush_append)
         else:
             print(text, flush=True)
 
+    def _flush_append(self) -> None:
+        self._flush_scheduled = False
+        if self._text is None or not self._pending_append:
+            return
+        text = "\n".join(self._pending_append)
+        self._pending_append.clear()
+        self._text.append(text)
+
     def _start_gui(self) -> None:
         try:
             from PyQt5.QtWidgets import (
@@ -153,6 +194,8 @@ class ChatIO:
         self._entry.clear()
         self.print_user_msg(msg)
         self._pending_input = msg
+        if self._input_loop is not None:
+            self._input_loop.quit()
 
 
 # Patch Chatbot.send_message to keep GUI responsive
@@ -171,21 +214,34 @@ def _run_blocking_with_gui_events(fn, *args, **kwargs):
         return fn(*args, **kwargs)
 
     result = None
+    error: Optional[BaseException] = None
     done = False
+    # Run in a copy of the caller's context so chatdb session/run ids follow the call
+    ctx = contextvars.copy_context()
+
+    QtCore = _QT_CORE
+    loop = QtCore.QEventLoop()
 
     def _call():
-        nonlocal result, done
-        result = fn(*args, **kwargs)
-        done = True
+        nonlocal result, error, done
+        try:
+            result = ctx.run(fn, *args, **kwargs)
+        except BaseException as e:
+            error = e
+        finally:
+            done = True
+            # Wake the GUI thread; queued so quit() runs on the loop's own thread
+            QtCore.QMetaObject.invokeMethod(loop, "quit", QtCore.Qt.QueuedConnection)
 
     t = threading.Thread(target=_call, daemon=True)
     t.start()
-    app = _CURRENT_CHAT_IO._qt_app
 
+    # Sleep in Qt's event loop (UI stays live) until the worker signals completion
     while not done:
-        app.processEvents()
-        time.sleep(0.01)
+        loop.exec_()
 
+    if error is not None:
+        raise error
     return result
 
 
@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional, Sequence
+
+from llm_geoprocessing.app.chatdb.chatdb import _is_truthy
+
+_DEFAULT_MAXSIZE = 256
+_DEFAULT_TTL = 3600.0
+
+
+def _env_number(name: str, default: float) -> float:
+    try:
+        value = float(os.getenv(name, default))
+    except ValueError:
+        return default
+    return value if math.isfinite(value) else default
+
+
+def cache_key(model: Optional[str], messages: Sequence[dict], temperature: Any = None) -> str:
+    """SHA-256 over the exact request payload (provider/model, temperature, messages)."""
+    payload = {"model": model, "temperature": temperature, "messages": list(messages)}
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """Exact-match, in-memory LRU cache of LLM replies with a TTL.
+
+    Disabled by default: an identical conversation sent twice normally gets a
+    fresh (sampled) answer, so reuse is opt-in via GEO_LLM_CACHE.
+    """
+
+    def __init__(
+        self,
+        enabled: Optional[bool] = None,
+        maxsize: Optional[int] = None,
+        ttl: Optional[float] = None,
+    ) -> None:
+        # Unset arguments come from the environment; size/TTL are only read when enabled
+        self.enabled: bool = _is_truthy(os.getenv("GEO_LLM_CACHE", "false")) if enabled is None else enabled
+        if maxsize is None:
+            maxsize = int(_env_number("GEO_LLM_CACHE_SIZE", _DEFAULT_MAXSIZE)) if self.enabled else _DEFAULT_MAXSIZE
+        if ttl is None:
+            ttl = _env_number("GEO_LLM_CACHE_TTL", _DEFAULT_TTL) if self.enabled else _DEFAULT_TTL
+        self.maxsize: int = max(1, maxsize)
+        self.ttl: float = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[str, tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                stored_at, value = item
+                if self.ttl <= 0 or time.monotonic() - stored_at < self.ttl:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return None
+
+    def set(self, key: str, value: str) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> str:
+        if not self.enabled:
+            return "LLM cache disabled (set GEO_LLM_CACHE=true to enable)"
+        with self._lock:
+            size = len(self._data)
+        total = self.hits + self.misses
+        rate = (100.0 * self.hits / total) if total else 0.0
+        return f"LLM cache: {size}/{self.maxsize} entries, {self.hits} hits, {self.misses} misses ({rate:.1f}% hit rate)"
+
+
+_cache_singleton: Optional[LLMCache] = None
+
+
+def get_llm_cache() -> LLMCache:
+    global _cache_singleton
+    if _cache_singleton is None:
+        _cache_singleton = LLMCache()
+    return _cache_singleton
@@ -1,18 +1,39 @@
-import os
-from typing import Optional
+import asyncio
+from datetime import datetime
+from typing import List, Optional, Union
 # from llm_geoprocessing.app.llm.LLM import ChatGPT, Ollama, Gemini, ChatMemory
 from llm_geoprocessing.app.llm.LLM import FactoryLLM, ChatMemory
+from llm_geoprocessing.app.chatbot.cache import cache_key, get_llm_cache
 from llm_geoprocessing.app.chatdb import get_chatdb
 from llm_geoprocessing.app.chatdb.context import set_session_id
 
 from llm_geoprocessing.app.logging_config import get_logger
 logger = get_logger("geollm")
 
+# Normalized command token -> action tag
+_COMMANDS = {
+    "exit": "exit",
+    "quit": "exit",
+    ":history": "history",
+    "/history": "history",
+    ":history-with-system": "history_sys",
+    "/history-with-system": "history_sys",
+    ":clear": "clear",
+    "/clear": "clear",
+    ":stats": "stats",
+    "/stats": "stats",
+}
+# Anything longer cannot be a command; skip normalizing long messages/prompts
+_MAX_COMMAND_LEN = max(len(c) for c in _COMMANDS)
+
 class Chatbot:
-    def __init__(self, persist: bool = True):
+    __slots__ = ("chat", "_chat_name", "chatdb", "session_id", "mem", "__weakref__")
+
+    def __init__(self, persist: bool = True, llm=None):
         
-        # Select + configure LLM from Factory
-        self.chat = FactoryLLM.create_llm(quiet=True)
+        # Select + configure LLM from Factory (unless a client is shared in)
+        self.chat = llm if llm is not None else FactoryLLM.create_llm(quiet=True)
+        self._chat_name = self.chat.__class__.__name__
         
         self.chatdb = None
         self.session_id = None
@@ -32,32 +53,35 @@ class Chatbot:
         self.mem.add_system(self._add_system_info())
     
     def _add_system_info(self):
-        system_info = "Today's date is " + os.popen(
-            "date '+YYYY-MM-DD = %Y-%m-%d at HH:MM:SS = %H:%M:%S'"
-            ).read().strip() + ".\n"
+        now = datetime.now()
+        system_info = f"Today's date is YYYY-MM-DD = {now:%Y-%m-%d} at HH:MM:SS = {now:%H:%M:%S}.\n"
         return system_info
     
     def check_command(self, msg: str) -> Optional[str]:
-        low = msg.strip().lower()
-        if low in ["exit", "quit"]:
+        s = msg.strip()
+        if len(s) > _MAX_COMMAND_LEN:
+            return None
+        action = _COMMANDS.get(s.casefold())
+        if action is None:
+            return None
+        if action == "exit":
             return "exit"
-        if low in [":history", "/history"]:
-            history =  self.mem.as_string(self.chat.__class__.__name__, include_system=False)
+        if action == "history":
+            history =  self.mem.as_string(self._chat_name, include_system=False)
             return "----- INIT: Chat History -----\n" + history + "\n----- END: Chat History -----"
-        if low in [":history-with-system", "/history-with-system"]:
-            history =  self.mem.as_string(self.chat.__class__.__name__, include_system=True)
+        if action == "history_sys":
+            history =  self.mem.as_string(self._chat_name, include_system=True)
             return "----- INIT: Chat History (with system) -----\n" + history + "\n----- END: Chat History -----"
-        if low in [":clear", "/clear"]:
-            self.mem.clear()
-            return "[memory cleared]"
-        return None
+        if action == "stats":
+            return get_llm_cache().stats()
+        # action == "clear"
+        self.mem.clear()
+        return "[memory cleared]"
     
     def clone(self, instructions_to_add: Optional[str] = None):
         """Create a clone of the chatbot with independent memory copy."""
-        cloned = Chatbot(persist=False)
-
         # *** share the same LLM client so RPM limit is global across clones ***
-        cloned.chat = self.chat
+        cloned = Chatbot(persist=False, llm=self.chat)
 
         # fresh memory for the clone
         cloned.mem = ChatMemory(persist=False)
@@ -88,9 +112,41 @@ class Chatbot:
 
     def send_message(self, msg: str) -> str:
         self.mem.add_user(msg)
-        response = self.chat.send_msg(self.mem.messages(), quiet=True)
+        response = self._send(self.mem.messages())
+        self.mem.add_assistant(response)
+        return response
+
+    async def send_message_async(self, msg: str) -> str:
+        """Like send_message, but awaits the LLM call in a worker thread."""
+        self.mem.add_user(msg)
+        response = await asyncio.to_thread(self._send, self.mem.messages())
         self.mem.add_assistant(response)
         return response
+
+    async def batch_send(self, msgs: List[str], max_concurrency: int = 8) -> List[Union[str, BaseException]]:
+        """Send each message to its own clone concurrently; results keep input order.
+
+        Failures are returned in place (not raised). Sync callers use asyncio.run(...).
+        """
+        sem = asyncio.Semaphore(max(1, max_concurrency))
+
+        async def _one(msg: str) -> str:
+            async with sem:
+                return await self.clone().send_message_async(msg)
+
+        return await asyncio.gather(*(_one(m) for m in msgs), return_exceptions=True)
+
+    def _send(self, messages) -> str:
+        """Call the LLM, going through the exact-match reply cache when it is enabled."""
+        cache = get_llm_cache()
+        if not cache.enabled:
+            return self.chat.send_msg(messages, quiet=True)
+        key = cache_key(f"{self._chat_name}:{self.chat.model}", messages, self.chat.temperature)
+        response = cache.get(key)
+        if response is None:
+            response = self.chat.send_msg(messages, quiet=True)
+            cache.set(key, response)
+        return response
     
     def chat_once(self, msg: Optional[str] = None):
         # If no message provided, ask for input
@@ -110,4 +166,4 @@ class Chatbot:
 
         # Send message to LLM and get response
         response = self.send_message(msg)
-        return f"{self.chat.__class__.__name__}: {response}"
+        return f"{self._chat_name}: {response}"
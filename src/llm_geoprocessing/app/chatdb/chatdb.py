@@ -1,17 +1,36 @@
 from __future__ import annotations
 
+import atexit
+import contextlib
+import io
 import json
 import os
+import threading
 import uuid
+from collections import deque
 from datetime import datetime, timezone
 from typing import Any, Optional
 
 try:
     import psycopg2
-    from psycopg2.extras import Json
+    import psycopg2.pool
+    from psycopg2.extras import Json, execute_values
 except Exception:
     psycopg2 = None
     Json = None
+    execute_values = None
+
+_POOL_MAX_CONN = 8
+
+# Marker recorded in chatdb._migrations once the shown_to_user backfill has run
+_MIGRATION_SHOWN_TO_USER = "messages_shown_to_user_backfill_v1"
+
+# Log rows are buffered and written in batches by a background thread
+_LOG_FLUSH_INTERVAL = 0.2  # seconds
+_LOG_FLUSH_BATCH = 500  # rows; also wakes the flusher early
+_LOG_QUEUE_MAX = 10000  # oldest rows are dropped beyond this
+_LOG_COPY_MIN_ROWS = 10  # below this a plain multi-row INSERT is cheaper than COPY
+_LOG_COLUMNS = "(id, ts, level, logger, message, session_id, run_id, exception_text, extra)"
 
 
 def _is_truthy(value: str) -> bool:
@@ -32,6 +51,17 @@ def _uuid(value: Optional[str | uuid.UUID]) -> Optional[str]:
     return str(value)
 
 
+def _csv_field(value: Any) -> str:
+    # COPY ... CSV: unquoted empty field is NULL, quoted "" is an empty string
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    elif not isinstance(value, str):
+        value = str(value)
+    return '"' + value.replace('"', '""') + '"'
+
+
 def _shown_to_user(role: str, content: str) -> bool:
     if role == "system":
         return False
@@ -43,36 +73,58 @@ def _shown_to_user(role: str, content: str) -> bool:
 class ChatDB:
     def __init__(self) -> None:
         self.enabled: bool = _chatdb_enabled() and psycopg2 is not None
-        self._conn = None
+        # Connection settings are read from the environment once
+        self._pg_kwargs = {
+            "host": os.getenv("POSTGIS_HOST", "localhost"),
+            "port": os.getenv("POSTGIS_PORT", "5432"),
+            "dbname": os.getenv("POSTGIS_DB", "geollm"),
+            "user": os.getenv("POSTGIS_USER", "geollm"),
+            "password": os.getenv("POSTGIS_PASSWORD", "geollm"),
+        }
+        self._pool = None
+        self._pool_lock = threading.Lock()
         self._schema_ready = False
+        self._pending_logs: deque = deque(maxlen=_LOG_QUEUE_MAX)
+        self._log_lock = threading.Lock()
+        self._log_wakeup = threading.Event()  # first row queued into an empty buffer
+        self._log_batch_full = threading.Event()  # enough rows for a full batch
+        self._log_flusher: Optional[threading.Thread] = None
+        if self.enabled:
+            atexit.register(self.close)
 
-    def _connect(self):
-        if not self.enabled or psycopg2 is None:
-            return None
+    def _get_pool(self):
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = psycopg2.pool.ThreadedConnectionPool(1, _POOL_MAX_CONN, **self._pg_kwargs)
+        return self._pool
+
+    @contextlib.contextmanager
+    def _cursor(self):
+        """Cursor on a pooled autocommit connection; raises if the DB is unreachable.
+
+        A connection that errored is closed instead of going back to the pool.
+        """
+        pool = self._get_pool()
+        conn = pool.getconn()
+        broken = True
         try:
-            conn = psycopg2.connect(
-                host=os.getenv("POSTGIS_HOST", "localhost"),
-                port=os.getenv("POSTGIS_PORT", "5432"),
-                dbname=os.getenv("POSTGIS_DB", "geollm"),
-                user=os.getenv("POSTGIS_USER", "geollm"),
-                password=os.getenv("POSTGIS_PASSWORD", "geollm"),
-            )
             conn.autocommit = True
-            return conn
-        except Exception:
-            return None
+            with conn.cursor() as cur:
+                yield cur
+            broken = False
+        finally:
+            pool.putconn(conn, close=broken or conn.closed != 0)
 
-    def _get_conn(self):
-        if not self.enabled:
-            return None
-        if self._conn is not None:
+    def close(self) -> None:
+        """Write pending logs and close pooled connections (registered with atexit)."""
+        self.flush_logs()
+        pool, self._pool = self._pool, None
+        if pool is not None:
             try:
-                if getattr(self._conn, "closed", 1) == 0:
-                    return self._conn
+                pool.closeall()
             except Exception:
-                self._conn = None
-        self._conn = self._connect()
-        return self._conn
+                pass
 
     def _json(self, value: Any):
         if value is None:
@@ -82,15 +134,10 @@ class ChatDB:
         return Json(value)
 
     def ensure_schema(self) -> None:
-        if not self.enabled:
-            return
-        conn = self._get_conn()
-        if conn is None:
-            return
-        if self._schema_ready:
+        if not self.enabled or self._schema_ready:
             return
         try:
-            with conn.cursor() as cur:
+            with self._cursor() as cur:
                 cur.execute("CREATE SCHEMA IF NOT EXISTS chatdb;")
                 cur.execute(
                     """
@@ -120,18 +167,36 @@ class ChatDB:
                 )
                 cur.execute(
                     """
-                    UPDATE chatdb.messages
-                    SET shown_to_user = false
-                    WHERE (role = 'system' OR content LIKE 'Generated JSON instructions:%')
-                      AND shown_to_user IS DISTINCT FROM false;
+                    CREATE TABLE IF NOT EXISTS chatdb._migrations (
+                        name text PRIMARY KEY,
+                        applied_at timestamptz NOT NULL DEFAULT now()
+                    );
                     """
                 )
+                # One-off backfill: full-table UPDATEs, so only run until recorded as applied
                 cur.execute(
-                    "UPDATE chatdb.messages SET shown_to_user = true WHERE shown_to_user IS NULL;"
-                )
-                cur.execute(
-                    "ALTER TABLE chatdb.messages ALTER COLUMN shown_to_user SET DEFAULT true;"
+                    "SELECT 1 FROM chatdb._migrations WHERE name = %s",
+                    (_MIGRATION_SHOWN_TO_USER,),
                 )
+                if cur.fetchone() is None:
+                    cur.execute(
+                        """
+                        UPDATE chatdb.messages
+                        SET shown_to_user = false
+                        WHERE (role = 'system' OR content LIKE 'Generated JSON instructions:%')
+                          AND shown_to_user IS DISTINCT FROM false;
+                        """
+                    )
+                    cur.execute(
+                        "UPDATE chatdb.messages SET shown_to_user = true WHERE shown_to_user IS NULL;"
+                    )
+                    cur.execute(
+                        "ALTER TABLE chatdb.messages ALTER COLUMN shown_to_user SET DEFAULT true;"
+                    )
+                    cur.execute(
+                        "INSERT INTO chatdb._migrations (name) VALUES (%s) ON CONFLICT DO NOTHING",
+                        (_MIGRATION_SHOWN_TO_USER,),
+                    )
                 cur.execute(
                     """
                     CREATE TABLE IF NOT EXISTS chatdb.runs (
@@ -156,6 +221,9 @@ class ChatDB:
                     );
                     """
                 )
+                cur.execute(
+                    "CREATE INDEX IF NOT EXISTS artifacts_sha256_idx ON chatdb.artifacts ((metadata->>'sha256'));"
+                )
                 cur.execute(
                     """
                     CREATE TABLE IF NOT EXISTS chatdb.logs (
@@ -173,7 +241,6 @@ class ChatDB:
                 )
             self._schema_ready = True
         except Exception:
-            self._conn = None
             self._schema_ready = False
 
     def create_session(self, title: Optional[str] = None, metadata: Optional[dict] = None) -> uuid.UUID:
@@ -181,11 +248,8 @@ class ChatDB:
         if not self.enabled:
             return session_id
         self.ensure_schema()
-        conn = self._get_conn()
-        if conn is None:
-            return session_id
         try:
-            with conn.cursor() as cur:
+            with self._cursor() as cur:
                 cur.execute(
                     """
                     INSERT INTO chatdb.sessions (id, created_at, title, metadata)
@@ -194,7 +258,7 @@ class ChatDB:
                     (_uuid(session_id), title, self._json(metadata)),
                 )
         except Exception:
-            self._conn = None
+            pass
         return session_id
 
     def insert_message(
@@ -208,11 +272,8 @@ class ChatDB:
         if not self.enabled:
             return
         self.ensure_schema()
-        conn = self._get_conn()
-        if conn is None:
-            return
         try:
-            with conn.cursor() as cur:
+            with self._cursor() as cur:
                 cur.execute(
                     """
                     INSERT INTO chatdb.messages
@@ -229,18 +290,15 @@ class ChatDB:
                     ),
                 )
         except Exception:
-            self._conn = None
+            pass
 
     def start_run(self, session_id: Optional[str | uuid.UUID] = None, params: Optional[dict] = None) -> uuid.UUID:
         run_id = uuid.uuid4()
         if not self.enabled:
             return run_id
         self.ensure_schema()
-        conn = self._get_conn()
-        if conn is None:
-            return run_id
         try:
-            with conn.cursor() as cur:
+            with self._cursor() as cur:
                 cur.execute(
                     """
                     INSERT INTO chatdb.runs (id, session_id, started_at, status, params)
@@ -249,18 +307,15 @@ class ChatDB:
                     (_uuid(run_id), _uuid(session_id), "running", self._json(params)),
                 )
         except Exception:
-            self._conn = None
+            pass
         return run_id
 
     def finish_run(self, run_id: str | uuid.UUID, status: str, extra: Optional[dict] = None) -> None:
         if not self.enabled:
             return
         self.ensure_schema()
-        conn = self._get_conn()
-        if conn is None:
-            return
         try:
-            with conn.cursor() as cur:
+            with self._cursor() as cur:
                 if extra is None:
                     cur.execute(
                         "UPDATE chatdb.runs SET ended_at = now(), status = %s WHERE id = %s",
@@ -279,7 +334,7 @@ class ChatDB:
                         (status, extra_json, _uuid(run_id)),
                     )
         except Exception:
-            self._conn = None
+            pass
 
     def insert_artifact(
         self,
@@ -291,11 +346,8 @@ class ChatDB:
         if not self.enabled:
             return
         self.ensure_schema()
-        conn = self._get_conn()
-        if conn is None:
-            return
         try:
-            with conn.cursor() as cur:
+            with self._cursor() as cur:
                 cur.execute(
                     """
                     INSERT INTO chatdb.artifacts (id, run_id, kind, uri, created_at, metadata)
@@ -304,38 +356,100 @@ class ChatDB:
                     (_uuid(uuid.uuid4()), _uuid(run_id), kind, uri, self._json(metadata)),
                 )
         except Exception:
-            self._conn = None
+            pass
 
-    def insert_log(self, record: dict) -> None:
+    def find_artifact_by_sha256(self, kind: str, sha256: str) -> Optional[str]:
+        """Latest artifact URI of this kind with the given content hash whose table still exists."""
         if not self.enabled:
-            return
+            return None
         self.ensure_schema()
-        conn = self._get_conn()
-        if conn is None:
-            return
         try:
-            ts = record.get("ts") or datetime.now(timezone.utc)
-            with conn.cursor() as cur:
+            with self._cursor() as cur:
                 cur.execute(
                     """
-                    INSERT INTO chatdb.logs
-                        (id, ts, level, logger, message, session_id, run_id, exception_text, extra)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+                    SELECT uri FROM chatdb.artifacts
+                    WHERE metadata->>'sha256' = %s
+                      AND kind = %s
+                      AND to_regclass(uri) IS NOT NULL
+                    ORDER BY created_at DESC
+                    LIMIT 1
                     """,
-                    (
-                        _uuid(uuid.uuid4()),
-                        ts,
-                        record.get("level"),
-                        record.get("logger"),
-                        record.get("message"),
-                        _uuid(record.get("session_id")),
-                        _uuid(record.get("run_id")),
-                        record.get("exception_text"),
-                        self._json(record.get("extra")),
-                    ),
+                    (sha256, kind),
                 )
+                row = cur.fetchone()
         except Exception:
-            self._conn = None
+            return None
+        return row[0] if row else None
+
+    def insert_log(self, record: dict) -> None:
+        """Queue a log row; a background thread writes queued rows in batches."""
+        if not self.enabled:
+            return
+        ts = record.get("ts") or datetime.now(timezone.utc)
+        extra = record.get("extra")
+        row = (
+            _uuid(uuid.uuid4()),
+            ts,
+            record.get("level"),
+            record.get("logger"),
+            record.get("message"),
+            _uuid(record.get("session_id")),
+            _uuid(record.get("run_id")),
+            record.get("exception_text"),
+            json.dumps(extra, default=str) if extra is not None else None,
+        )
+        with self._log_lock:
+            self._pending_logs.append(row)
+            pending = len(self._pending_logs)
+            if self._log_flusher is None:
+                self._log_flusher = threading.Thread(
+                    target=self._flush_loop, name="chatdb-log-flusher", daemon=True
+                )
+                self._log_flusher.start()
+        if pending == 1:
+            self._log_wakeup.set()
+        elif pending >= _LOG_FLUSH_BATCH:
+            self._log_batch_full.set()
+
+    def _flush_loop(self) -> None:
+        while True:
+            # Idle: block until a row arrives, then let a batch gather briefly
+            self._log_wakeup.wait()
+            self._log_wakeup.clear()
+            self._log_batch_full.wait(_LOG_FLUSH_INTERVAL)
+            self._log_batch_full.clear()
+            self.flush_logs()
+            # A failed write can leave rows behind; go round again for those
+            with self._log_lock:
+                if self._pending_logs:
+                    self._log_wakeup.set()
+
+    def flush_logs(self) -> None:
+        """Write all queued log rows now."""
+        while True:
+            with self._log_lock:
+                if not self._pending_logs:
+                    return
+                rows = [self._pending_logs.popleft() for _ in range(min(_LOG_FLUSH_BATCH, len(self._pending_logs)))]
+            self.ensure_schema()
+            try:
+                with self._cursor() as cur:
+                    if len(rows) < _LOG_COPY_MIN_ROWS:
+                        execute_values(
+                            cur,
+                            f"INSERT INTO chatdb.logs {_LOG_COLUMNS} VALUES %s",
+                            rows,
+                            template="(%s, %s, %s, %s, %s, %s, %s, %s, %s::jsonb)",
+                        )
+                    else:
+                        buf = io.StringIO()
+                        for row in rows:
+                            buf.write(",".join(_csv_field(v) for v in row))
+                            buf.write("\n")
+                        buf.seek(0)
+                        cur.copy_expert(f"COPY chatdb.logs {_LOG_COLUMNS} FROM STDIN WITH (FORMAT csv)", buf)
+            except Exception:
+                return
 
 
 _chatdb_singleton: Optional[ChatDB] = None
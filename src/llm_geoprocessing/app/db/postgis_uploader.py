@@ -4,16 +4,33 @@ import os
 import re
 import shutil
 import subprocess
-import tempfile
+import threading
 import unicodedata
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import Optional
 
+try:
+    import fcntl  # POSIX only; used to widen the raster2pgsql -> psql pipe
+except ImportError:
+    fcntl = None
+
 from llm_geoprocessing.app.logging_config import get_logger
 
 logger = get_logger("geollm")
 
+# PostGIS CLI tools, resolved once at import (None if not in PATH)
+_RASTER2PGSQL = shutil.which("raster2pgsql")
+_PSQL = shutil.which("psql")
+
+# Kernel buffer for the raster2pgsql -> psql pipe (Linux default is 64 KiB)
+_PIPE_SIZE = 1 << 20
+_F_SETPIPE_SZ = getattr(fcntl, "F_SETPIPE_SZ", 1031)
+
+# Table-name sanitising patterns
+_NON_IDENT_RE = re.compile(r"[^a-z0-9_]+")
+_UNDERSCORES_RE = re.compile(r"_+")
+
 
 def is_postgis_enabled() -> bool:
     return os.getenv("POSTGIS_ENABLED", "false").lower() in {"1", "true", "yes", "on"}
@@ -29,11 +46,21 @@ def _pg_env_from_settings() -> dict:
     }
 
 
+def _widen_pipe(fd: int) -> None:
+    """Best effort: grow a pipe's buffer so the producer stalls less (Linux only)."""
+    if fcntl is None:
+        return
+    try:
+        fcntl.fcntl(fd, _F_SETPIPE_SZ, _PIPE_SIZE)
+    except OSError:
+        pass
+
+
 def _safe_table_name(base: str) -> str:
     base = unicodedata.normalize("NFKD", base).encode("ascii", "ignore").decode("ascii")
     base = base.lower()
-    base = re.sub(r"[^a-z0-9_]+", "_", base)
-    base = re.sub(r"_+", "_", base).strip("_")
+    base = _NON_IDENT_RE.sub("_", base)
+    base = _UNDERSCORES_RE.sub("_", base).strip("_")
     if not base:
         return "t"
     if not base[0].isalpha():
@@ -54,7 +81,7 @@ def upload_raster_to_postgis(
         logger.warning("File not found: %s", raster_path)
         return None
 
-    if shutil.which("raster2pgsql") is None or shutil.which("psql") is None:
+    if _RASTER2PGSQL is None or _PSQL is None:
         logger.error("raster2pgsql or psql not found.")
         return None
 
@@ -77,38 +104,66 @@ def upload_raster_to_postgis(
     CREATE EXTENSION IF NOT EXISTS postgis_raster;
     """
     subprocess.run(
-        ["psql", "-v", "ON_ERROR_STOP=1", "-X", "-c", bootstrap_sql],
+        [_PSQL, "-v", "ON_ERROR_STOP=1", "-X", "-c", bootstrap_sql],
         env=env,
         check=True,
         text=True,
     )
 
     # raster2pgsql with tiling + COPY
-    cmd = ["raster2pgsql", "-I", "-C", "-M", "-Y", "-t", tile_size, str(raster_path), full_table]
+    cmd = [_RASTER2PGSQL, "-I", "-C", "-M", "-Y", "-t", tile_size, str(raster_path), full_table]
 
     logger.info("Uploading %s -> %s (tile=%s)", raster_path.name, full_table, tile_size)
 
-    # Capture raster2pgsql stderr to a temp file to avoid deadlocks
-    with tempfile.NamedTemporaryFile(mode="w+", suffix=".raster2pgsql.log", delete=False) as logf:
-        log_path = logf.name
-        p1 = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=logf, env=env, text=True)
-
-    p2 = subprocess.Popen(
-        ["psql", "-v", "ON_ERROR_STOP=1", "-X"],
-        stdin=p1.stdout,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        env=env,
-        text=True,
-    )
-
-    assert p1.stdout is not None
-    p1.stdout.close()
-    out2, err2 = p2.communicate()
-    p1.wait()
-
-    with open(log_path, "r", encoding="utf-8", errors="replace") as f:
-        err1 = f.read()
+    # raster2pgsql writes straight into psql through a widened OS pipe
+    r_fd, w_fd = os.pipe()
+    _widen_pipe(w_fd)
+    try:
+        p1 = subprocess.Popen(
+            cmd, stdout=w_fd, stderr=subprocess.PIPE, env=env, text=True, errors="replace"
+        )
+        try:
+            p2 = subprocess.Popen(
+                [_PSQL, "-v", "ON_ERROR_STOP=1", "-X"],
+                stdin=r_fd,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                env=env,
+                text=True,
+                errors="replace",
+            )
+        except BaseException:
+            # Don't leave raster2pgsql running (or a zombie) if psql can't start
+            p1.kill()
+            p1.wait()
+            if p1.stderr is not None:
+                p1.stderr.close()
+            raise
+    finally:
+        # Children hold their own copies; closing ours lets EOF/SIGPIPE propagate
+        os.close(w_fd)
+        os.close(r_fd)
+
+    # Drain raster2pgsql stderr concurrently so it can never fill and block
+    assert p1.stderr is not None
+    err1_parts: list[str] = []
+    err1_reader = threading.Thread(target=lambda: err1_parts.append(p1.stderr.read()), daemon=True)
+    err1_reader.start()
+
+    ok = False
+    try:
+        out2, err2 = p2.communicate()
+        p1.wait()
+        ok = True
+    finally:
+        if not ok:
+            # Interrupted (e.g. KeyboardInterrupt): don't leave either side running
+            for proc in (p1, p2):
+                proc.kill()
+                proc.wait()
+        err1_reader.join()
+        p1.stderr.close()
+    err1 = "".join(err1_parts)
 
     if p2.returncode != 0 or p1.returncode != 0:
         logger.error("PostGIS upload failed.\npsql stderr:\n%s\nraster2pgsql stderr:\n%s", err2, err1)
@@ -1,6 +1,16 @@
 import os
 from llm_geoprocessing.app.llm.LLM import Gemini, ChatMemory
 
+# Normalized command token -> action tag
+_COMMANDS = {
+    "exit": "exit",
+    "quit": "exit",
+    ":history": "history",
+    "/history": "history",
+    ":clear": "clear",
+    "/clear": "clear",
+}
+
 if __name__ == "__main__":
     # Gemini
     chat = Gemini(model="gemini-2.5-flash", quiet=True)
@@ -16,13 +26,13 @@ if __name__ == "__main__":
         msg = input("You: ")
         if not msg.strip():
             continue
-        low = msg.strip().lower()
-        if low in ["exit", "quit"]:
+        command = _COMMANDS.get(msg.strip().lower())
+        if command == "exit":
             break
-        if low in [":history", "/history"]:
+        if command == "history":
             print(mem.as_string(chat.__class__.__name__))
             continue
-        if low in [":clear", "/clear"]:
+        if command == "clear":
             mem.clear()
             print("[memory cleared]")
             continue
@@ -15,6 +15,7 @@ from __future__ import annotations
 
 import os
 import sys
+import threading
 import time
 import io
 import json
@@ -100,22 +101,46 @@ class _SilenceStderrFD:
         return False
 
 
+# Process-wide quiet state: fd 2 and sys.stderr are global, so concurrent
+# callers share one silencer (first in enters it, last out restores).
+_QUIET_LOCK = threading.Lock()
+_quiet_depth = 0
+_quiet_stack: Optional[contextlib.ExitStack] = None
+
+
+@contextlib.contextmanager
+def _shared_quiet():
+    global _quiet_depth, _quiet_stack
+    with _QUIET_LOCK:
+        if _quiet_depth == 0:
+            stack = contextlib.ExitStack()
+            # Enter fd-level first
+            stack.enter_context(_SilenceStderrFD())
+            # Then Python-level
+            stack.enter_context(contextlib.redirect_stderr(io.StringIO()))
+            _quiet_stack = stack
+        _quiet_depth += 1
+    try:
+        yield
+    finally:
+        with _QUIET_LOCK:
+            _quiet_depth -= 1
+            if _quiet_depth == 0 and _quiet_stack is not None:
+                stack, _quiet_stack = _quiet_stack, None
+                stack.close()
+
+
 def _quiet_ctx(enabled: bool):
     """
     Combined quiet context:
       1) fd-level silencer (handles native libs)
       2) Python-level redirect_stderr (handles Python loggers)
     Order matters: FD first, then Python redirect.
+    Safe to use from several threads at once (reference-counted).
     """
     if not enabled:
         return contextlib.nullcontext()
-
-    stack = contextlib.ExitStack()
-    # Enter fd-level first
-    stack.enter_context(_SilenceStderrFD())
-    # Then Python-level
-    stack.enter_context(contextlib.redirect_stderr(io.StringIO()))
-    return stack
+    return _shared_quiet()
 
 
 # ---- Chat memory -----------------------------------------------------
@@ -260,6 +285,8 @@ class LLM(ABC):
         self._rpm_limit: Optional[int] = int(rpm_limit) if rpm_limit is not None else None
         self._rpm_window: float = 60.0
         self._rpm_calls: List[float] = []
+        # clones share one client and may call it from several threads
+        self._rpm_lock = threading.Lock()
 
     def config_api(self, **_: Any) -> None:
         raise NotImplementedError
@@ -331,18 +358,20 @@ class LLM(ABC):
     def _throttle(self) -> None:
         if not self._rpm_limit:
             return
-        now = time.time()
-        # drop timestamps outside the window
-        while self._rpm_calls and now - self._rpm_calls[0] >= self._rpm_window:
-            self._rpm_calls.pop(0)
-        if len(self._rpm_calls) >= self._rpm_limit:
-            sleep_for = self._rpm_window - (now - self._rpm_calls[0]) + 0.001
-            if sleep_for > 0:
-                time.sleep(sleep_for)
+        # held while waiting: concurrent callers queue up for the next free slot
+        with self._rpm_lock:
             now = time.time()
+            # drop timestamps outside the window
             while self._rpm_calls and now - self._rpm_calls[0] >= self._rpm_window:
                 self._rpm_calls.pop(0)
-        self._rpm_calls.append(time.time())
+            if len(self._rpm_calls) >= self._rpm_limit:
+                sleep_for = self._rpm_window - (now - self._rpm_calls[0]) + 0.001
+                if sleep_for > 0:
+                    time.sleep(sleep_for)
+                now = time.time()
+                while self._rpm_calls and now - self._rpm_calls[0] >= self._rpm_window:
+                    self._rpm_calls.pop(0)
+            self._rpm_calls.append(time.time())
 
 
 # ---- OpenAI: ChatGPT --------------------------------------------------------
@@ -1,4 +1,7 @@
+import contextvars
+import hashlib
 import json
+import logging
 import re
 from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime
@@ -7,7 +10,12 @@ import subprocess
 import shutil
 import requests
 import os
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import rasterio  # optional; in-process SRS reads (falls back to gdalinfo)
+except ImportError:
+    rasterio = None
 
 from llm_geoprocessing.app.chatbot.chatbot import Chatbot
 from llm_geoprocessing.app.plugins.preprocessing_plugin import get_metadata_preprocessing, get_documentation_preprocessing
@@ -104,18 +112,29 @@ def _schema_instructions() -> str:
     return _plugin_instructions() + "\n\n" + schema
 
 
+# Precompiled patterns used on every LLM reply / validation pass
+_BARE_NAN_RE       = re.compile(r'(?<!\")\bNaN\b(?!\")')
+_TRAILING_COMMA_RE = re.compile(r",\s*([}\]])")
+_FENCED_JSON_RE    = re.compile(r"```(?:json)?\s*(\{[\s\S]*?\})\s*```", re.IGNORECASE)
+_BARE_JSON_RE      = re.compile(r"(\{[\s\S]*\})")
+_QUOTED_RE         = re.compile(r"'[^']*'")
+_DIGITS_RE         = re.compile(r"\d+")
+_SPACES_RE         = re.compile(r"\s+")
+_DATE_RE           = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+
 def _sanitize_json(raw: str) -> str:
     # Replace bare NaN -> "NaN"; remove trailing commas
-    s = re.sub(r'(?<!\")\bNaN\b(?!\")', '"NaN"', raw)
-    s = re.sub(r",\s*([}\]])", r"\1", s)
+    s = _BARE_NAN_RE.sub('"NaN"', raw)
+    s = _TRAILING_COMMA_RE.sub(r"\1", s)
     return s
 
 
 def _extract_first_json_block(text: str) -> Optional[Dict[str, Any]]:
     # Prefer fenced code blocks
-    blocks = re.findall(r"```(?:json)?\s*(\{[\s\S]*?\})\s*```", text, flags=re.IGNORECASE)
+    blocks = _FENCED_JSON_RE.findall(text)
     if not blocks:
-        blocks = re.findall(r"(\{[\s\S]*\})", text)
+        blocks = _BARE_JSON_RE.findall(text)
 
     for b in blocks:
         try:
@@ -369,9 +388,9 @@ def check_and_fix_json(
     def _normalize_error_key(msg: str) -> str:
         # Bucket similar errors together by stripping indices, quoted values, and numbers.
         # This keeps the per-error counter meaningful with minimal code.
-        k = re.sub(r"'[^']*'", "''", msg)      # remove quoted specifics
-        k = re.sub(r"\d+", "#", k)             # replace digits
-        k = re.sub(r"\s+", " ", k).strip()     # collapse spaces
+        k = _QUOTED_RE.sub("''", msg)      # remove quoted specifics
+        k = _DIGITS_RE.sub("#", k)         # replace digits
+        k = _SPACES_RE.sub(" ", k).strip() # collapse spaces
         return k
 
     def _retry_with_llm(err_msg: str) -> Dict[str, Any]:
@@ -419,8 +438,6 @@ def check_and_fix_json(
             raise ValueError("'other_params' must be a dict.")
 
         # Per-product validation
-        date_pat = re.compile(r"^\d{4}-\d{2}-\d{2}$")
-
         def _parse_date(s: str) -> datetime:
             return datetime.strptime(s, "%Y-%m-%d")
 
@@ -461,9 +478,9 @@ def check_and_fix_json(
 
                 di = pobj["date"]["initial_date"]
                 de = pobj["date"]["end_date"]
-                if not (isinstance(di, str) and date_pat.match(di)):
+                if not (isinstance(di, str) and _DATE_RE.match(di)):
                     raise ValueError(f"Product '{pobj['id']}'.date['initial_date'] must be 'YYYY-MM-DD'.")
-                if not (isinstance(de, str) and date_pat.match(de)):
+                if not (isinstance(de, str) and _DATE_RE.match(de)):
                     raise ValueError(f"Product '{pobj['id']}'.date['end_date'] must be 'YYYY-MM-DD'.")
                 if _parse_date(di) > _parse_date(de):
                     raise ValueError(f"Product '{pobj['id']}' has initial_date after end_date.")
@@ -515,11 +532,11 @@ def check_and_fix_json(
                     raise ValueError(f"'actions[{i}].input_json.geodesic' must be boolean.")
                 if "date_initial" in params:
                     di = params["date_initial"]
-                    if not (isinstance(di, str) and date_pat.match(di)):
+                    if not (isinstance(di, str) and _DATE_RE.match(di)):
                         raise ValueError(f"'actions[{i}].input_json.date_initial' must be 'YYYY-MM-DD'.")
                 if "date_end" in params:
                     de = params["date_end"]
-                    if not (isinstance(de, str) and date_pat.match(de)):
+                    if not (isinstance(de, str) and _DATE_RE.match(de)):
                         raise ValueError(f"'actions[{i}].input_json.date_end' must be 'YYYY-MM-DD'.")
                 if "date_initial" in params and "date_end" in params:
                     if _parse_date(params["date_initial"]) > _parse_date(params["date_end"]):
@@ -547,28 +564,42 @@ OUTPUT_BASE_DIR = Path(os.getenv("GEO_OUT_DIR", "/tmp"))
 TILES_ROOT      = OUTPUT_BASE_DIR / "gee_tiles"
 MERGED_ROOT     = OUTPUT_BASE_DIR / "gee_merged"
 
+# Max concurrent tile downloads per action (env GEO_TILE_WORKERS)
+TILE_WORKERS    = max(1, int(os.getenv("GEO_TILE_WORKERS", "4")))
+
+# GDAL CLI tools, resolved once at import (None if not in PATH)
+_GDALBUILDVRT   = shutil.which("gdalbuildvrt")
+_GDAL_TRANSLATE = shutil.which("gdal_translate")
+_GDALINFO       = shutil.which("gdalinfo")
+_GDAL_EDIT      = shutil.which("gdal_edit.py")
+
 def _debug_env():
     logger.debug(f"PATH={os.environ.get('PATH','')}")
     logger.debug(f"GEO_OUT_DIR={OUTPUT_BASE_DIR}")
     logger.debug(f"CWD={os.getcwd()}")
-    logger.debug(f"gdalbuildvrt={shutil.which('gdalbuildvrt')}")
-    logger.debug(f"gdal_translate={shutil.which('gdal_translate')}")
+    logger.debug(f"gdalbuildvrt={_GDALBUILDVRT}")
+    logger.debug(f"gdal_translate={_GDAL_TRANSLATE}")
     logger.debug(f"TILES_ROOT={TILES_ROOT} exists? {TILES_ROOT.exists()}")
     logger.debug(f"MERGED_ROOT={MERGED_ROOT} exists? {MERGED_ROOT.exists()}")
 
 def _print_tree(root: Path, depth: int = 2):
+    if not logger.isEnabledFor(logging.DEBUG):
+        return  # debug-only output: skip the directory walk entirely
     try:
         root = Path(root)
         logger.debug(f"Tree: {root} (depth={depth})")
         if not root.exists():
             logger.debug("  (does not exist)")
             return
-        def _walk(d: Path, level: int = 0):
+        def _walk(d: str, level: int = 0):
             if level > depth: return
-            for p in sorted(d.iterdir()):
-                logger.debug("  " * level + f"- {p.name}")
-                if p.is_dir(): _walk(p, level + 1)
-        _walk(root, 0)
+            # scandir entries carry their file type, no extra stat per child
+            with os.scandir(d) as it:
+                entries = sorted(it, key=lambda e: e.name)
+            for e in entries:
+                logger.debug("  " * level + f"- {e.name}")
+                if e.is_dir(): _walk(e.path, level + 1)
+        _walk(str(root), 0)
     except Exception as e:
         logger.debug(f"tree error for {root}: {e}")
 
@@ -578,11 +609,12 @@ def _ensure_outdirs() -> None:
 
 def _clean_dir(p: Path) -> None:
     if p.exists():
-        for child in p.iterdir():
-            if child.is_file() or child.is_symlink():
-                child.unlink(missing_ok=True)
-            elif child.is_dir():
-                shutil.rmtree(child)
+        with os.scandir(p) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    shutil.rmtree(entry.path)
+                else:
+                    Path(entry.path).unlink(missing_ok=True)
     else:
         p.mkdir(parents=True, exist_ok=True)
 
@@ -604,18 +636,30 @@ def _download_tiles(urls: list[str], tiles_dir: Path, stem: str) -> list[Path]:
     # add timestamp so each run gets unique tile filenames
     ts = datetime.now().strftime("timestamp-%Y-%m-%d-%H-%M-%S-%f")
 
-    out_paths: list[Path] = []
-    for i, u in enumerate(urls, 1):
-        # always write .tif — GEE endpoints here return GeoTIFF for /tif/* routes
-        p = tiles_dir / f"{stem}_{ts}_tile_{i:02d}.tif"
+    # always write .tif — GEE endpoints here return GeoTIFF for /tif/* routes
+    out_paths = [tiles_dir / f"{stem}_{ts}_tile_{i:02d}.tif" for i in range(1, len(urls) + 1)]
+
+    def _fetch(u: str, p: Path) -> Path:
         _download_file(u, p)
         _maybe_fix_modis_sinusoidal_srs(p)
-        out_paths.append(p)
-    return out_paths
+        return p
+
+    # Tiles are independent and I/O-bound: fetch them concurrently, keep order
+    workers = min(TILE_WORKERS, len(urls))
+    if workers <= 1:
+        return [_fetch(u, p) for u, p in zip(urls, out_paths)]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # One context copy per task (a Context can't be entered by two threads at
+        # once) so worker logs keep the chatdb session/run ids
+        futures = [
+            pool.submit(contextvars.copy_context().run, _fetch, u, p)
+            for u, p in zip(urls, out_paths)
+        ]
+        return [f.result() for f in futures]
 
 def _require_gdal() -> tuple[str, str]:
-    vb = shutil.which("gdalbuildvrt")
-    gt = shutil.which("gdal_translate")
+    vb = _GDALBUILDVRT
+    gt = _GDAL_TRANSLATE
     logger.debug(f"which gdalbuildvrt -> {vb}")
     logger.debug(f"which gdal_translate -> {gt}")
     if not vb or not gt:
@@ -624,27 +668,40 @@ def _require_gdal() -> tuple[str, str]:
         )
     return vb, gt
 
+def _read_srs_text(tif: Path) -> str:
+    """
+    Return the raster SRS as text (WKT) for quick projection checks.
+    Reads it in-process with rasterio when available; falls back to gdalinfo.
+    """
+    if rasterio is not None:
+        with rasterio.open(tif) as ds:
+            return ds.crs.to_wkt() if ds.crs else ""
+
+    if not _GDALINFO:
+        return ""
+    # Only the SRS is needed: skip metadata, RAT, color table, GCPs and file list
+    proc = subprocess.run(
+        [_GDALINFO, "-json", "-nomd", "-norat", "-noct", "-nogcp", "-nofl", str(tif)],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        check=True,
+        timeout=30,
+    )
+    return proc.stdout or ""
+
 def _maybe_fix_modis_sinusoidal_srs(tif: Path) -> None:
     """
     If the tile uses MODIS Sinusoidal, reset the SRS to use the MODIS sphere.
     This avoids the small offset caused by WGS84 ellipsoid in the WKT.
     """
     try:
-        gdal_edit = shutil.which("gdal_edit.py")
-        gdalinfo  = shutil.which("gdalinfo")
-        if not gdal_edit or not gdalinfo:
+        gdal_edit = _GDAL_EDIT
+        if not gdal_edit:
             return
 
         # Inspect projection; only touch MODIS Sinusoidal rasters
-        proc = subprocess.run(
-            [gdalinfo, "-json", str(tif)],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            check=True,
-            timeout=30,
-        )
-        info = proc.stdout or ""
+        info = _read_srs_text(tif)
         if "MODIS Sinusoidal" not in info and "Sinusoidal" not in info:
             return
 
@@ -681,9 +738,16 @@ def _merge_with_gdal(src_files: list[Path], out_tif: Path) -> Path:
         [vb, str(vrt), *[str(p) for p in src_files]],
         check=True
     )
-    # translate to GeoTIFF
+    # translate to GeoTIFF (multi-threaded, larger block cache for many tiles)
     subprocess.run(
-        [gt, str(vrt), str(out_path)],
+        [
+            gt,
+            "--config", "GDAL_NUM_THREADS", "ALL_CPUS",
+            "--config", "GDAL_CACHEMAX", "512",
+            "-co", "NUM_THREADS=ALL_CPUS",
+            str(vrt),
+            str(out_path),
+        ],
         check=True
     )
     # optional cleanup
@@ -788,11 +852,21 @@ def geoprocess(json_instructions) -> str:
                 # Optional: upload merged raster to PostGIS and then remove the local file.
                 if is_postgis_enabled():
                     try:
-                        table = upload_raster_to_postgis(final_path, out_id)
+                        # Identical rasters already in PostGIS are reused instead of re-uploaded
+                        sha256 = table = None
+                        if chatdb.enabled:
+                            with open(final_path, "rb") as f:
+                                sha256 = hashlib.file_digest(f, "sha256").hexdigest()
+                            table = chatdb.find_artifact_by_sha256("postgis_raster_table", sha256)
+                            if table:
+                                logger.info("Raster %s already in PostGIS as %s; skipping upload", final_path.name, table)
+                        if not table:
+                            table = upload_raster_to_postgis(final_path, out_id)
                         if table:
                             postgis_tables[out_id] = table
                             if run_id and chatdb.enabled:
-                                chatdb.insert_artifact(run_id, "postgis_raster_table", table)
+                                meta = {"sha256": sha256, "bytes": final_path.stat().st_size} if sha256 else None
+                                chatdb.insert_artifact(run_id, "postgis_raster_table", table, metadata=meta)
                             try:
                                 final_path.unlink()
                                 logger.debug("Removed merged file after PostGIS upload: %s", final_path)
@@ -843,6 +917,7 @@ def main(chatbot: Chatbot, chat_io: ChatIO, msg: str) -> Tuple[Chatbot, str] | s
     # Save JSON generation in chat history (But not show to user)
     chatbot.mem.add_assistant(f"Generated JSON instructions:\n{json.dumps(json_instructions, ensure_ascii=False, indent=2)}")
 
-    msg_to_interpreter = geoprocess(json_instructions)
+    # Downloads/GDAL/PostGIS can take minutes: keep the GUI responsive meanwhile
+    msg_to_interpreter = chat_io.run_blocking(geoprocess, json_instructions)
     
     return chatbot, msg_to_interpreter
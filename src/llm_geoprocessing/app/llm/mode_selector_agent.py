@@ -84,10 +84,13 @@ def define_mode(chatbot: Chatbot, msg: str, modes: list, modes_explained: Option
     if command == "exit":
         return "exit"
 
-    # Prepare the mode selection prompt
+    # Prepare the mode selection prompt. It is static, so send it first (as a
+    # system message) ahead of the history: the provider can then reuse its
+    # prompt-prefix cache instead of re-reading it after the conversation.
     base_prompt = prepare_mode_prompt(modes, modes_explained)
+    chat.mem.insert(0, "system", base_prompt)
     # Add user message to the prompt
-    prompt = f"{base_prompt}\n\nUser Input: {msg}\n\nSelected Mode:"
+    prompt = f"User Input: {msg}\n\nSelected Mode:"
     
     # --- Select mode
     # Ask for the mode once
@@ -101,7 +104,6 @@ def define_mode(chatbot: Chatbot, msg: str, modes: list, modes_explained: Option
         reason = "it mentions multiple modes"
 
     retry_prompt = (
-        f"{base_prompt}\n\n"
         f"User Input: {msg}\n\n"
         f"Your previous response was invalid because {reason}.\n"
         f"Previous response: {response}\n"
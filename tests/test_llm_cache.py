@@ -0,0 +1,59 @@
+from llm_geoprocessing.app.chatbot import cache as cache_mod
+from llm_geoprocessing.app.chatbot.cache import LLMCache, cache_key
+
+MSGS = [{"role": "user", "content": "hola"}]
+
+
+def test_cache_key_is_stable_and_payload_sensitive():
+    key = cache_key("Gemini:gemini-2.5-flash", MSGS, 0.3)
+    assert key == cache_key("Gemini:gemini-2.5-flash", [dict(m) for m in MSGS], 0.3)
+    assert len(key) == 64
+    assert key != cache_key("Gemini:gemini-2.5-pro", MSGS, 0.3)
+    assert key != cache_key("Gemini:gemini-2.5-flash", MSGS, 1.0)
+    assert key != cache_key("Gemini:gemini-2.5-flash", [{"role": "user", "content": "hola!"}], 0.3)
+
+
+def test_disabled_cache_never_stores():
+    cache = LLMCache(enabled=False)
+    cache.set("k", "v")
+    assert cache.get("k") is None
+    assert cache.hits == cache.misses == 0
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LLMCache(enabled=True, maxsize=2, ttl=0)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    assert cache.get("a") == "1"  # "b" is now least recently used
+    cache.set("c", "3")
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+    assert cache.get("c") == "3"
+    assert (cache.hits, cache.misses) == (3, 1)
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_mod.time, "monotonic", lambda: now[0])
+    cache = LLMCache(enabled=True, maxsize=8, ttl=10)
+    cache.set("k", "v")
+    now[0] += 9
+    assert cache.get("k") == "v"
+    now[0] += 2
+    assert cache.get("k") is None
+
+
+def test_bad_size_and_ttl_env_fall_back_to_defaults(monkeypatch):
+    monkeypatch.setenv("GEO_LLM_CACHE", "true")
+    monkeypatch.setenv("GEO_LLM_CACHE_SIZE", "lots")
+    monkeypatch.setenv("GEO_LLM_CACHE_TTL", "nan")
+    cache = LLMCache()
+    assert cache.enabled
+    assert (cache.maxsize, cache.ttl) == (256, 3600.0)
+
+
+def test_size_and_ttl_env_ignored_when_disabled(monkeypatch):
+    monkeypatch.delenv("GEO_LLM_CACHE", raising=False)
+    monkeypatch.setenv("GEO_LLM_CACHE_SIZE", "not-a-number")
+    cache = LLMCache()
+    assert not cache.enabled